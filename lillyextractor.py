@@ -6,39 +6,48 @@ Clean, professional interface for RWE data analysis and visualization
 import streamlit as st
 import pandas as pd
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
-import plotly.graph_objects as go
 from io import BytesIO
+import hashlib
+import importlib.util
 import json
+import random
+import threading
+import time
+from cachetools import TTLCache
 
-# Try to import AI libraries
-try:
-    from pptx import Presentation
-    PPTX_SUPPORT = True
-except ImportError:
-    PPTX_SUPPORT = False
+# Document libraries are only imported when a matching file is uploaded
+PPTX_SUPPORT = importlib.util.find_spec("pptx") is not None
+PDF_SUPPORT = importlib.util.find_spec("PyPDF2") is not None
 
-try:
-    from PyPDF2 import PdfReader
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
+# Provider errors worth retrying: timeouts, dropped connections and server-side failures
+TRANSIENT_AI_ERRORS = (TimeoutError, ConnectionError)
 
+# Try to import AI libraries
 try:
+    import groq
     from groq import Groq
+    # APITimeoutError subclasses APIConnectionError
+    TRANSIENT_AI_ERRORS += (groq.APIConnectionError, groq.InternalServerError)
     GROQ_AVAILABLE = True
 except ImportError:
     GROQ_AVAILABLE = False
 
 try:
+    import openai
     from openai import OpenAI
+    TRANSIENT_AI_ERRORS += (openai.APIConnectionError, openai.InternalServerError)
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (once per process; os.environ persists across reruns)
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    load_dotenv()
+    return True
+
+load_environment()
 
 # Configure page
 st.set_page_config(
@@ -56,10 +65,10 @@ if 'tts_enabled' not in st.session_state:
     st.session_state.tts_enabled = False
 if 'chatbot_messages' not in st.session_state:
     st.session_state.chatbot_messages = []
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
 if 'analysis_text' not in st.session_state:
     st.session_state.analysis_text = ''
+if 'analysis_preview' not in st.session_state:
+    st.session_state.analysis_preview = ''
 if 'input_method' not in st.session_state:
     st.session_state.input_method = "Upload File"
 
@@ -71,142 +80,273 @@ OPENAI_API_KEY = None  # Removed - use .env if needed
 model = None
 active_model = None
 
-# Try Groq first (with SSL verification disabled for corporate networks)
+# Clients live for the whole process so reruns and fallbacks reuse open connections
+@st.cache_resource(show_spinner=False)
+def get_http_client():
+    """Shared HTTP client (with SSL verification disabled for corporate networks)"""
+    import httpx
+    return httpx.Client(
+        verify=False,
+        timeout=60.0,
+        limits=httpx.Limits(max_keepalive_connections=8, max_connections=16)
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_groq_client(api_key):
+    # call_with_backoff is the only retry layer, so turn off the SDK's own retries
+    return Groq(api_key=api_key, http_client=get_http_client(), max_retries=0)
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    return OpenAI(api_key=api_key, http_client=get_http_client(), max_retries=0)
+
+# Try Groq first
 if GROQ_API_KEY and GROQ_AVAILABLE:
     try:
-        import httpx
-        http_client = httpx.Client(verify=False, timeout=60.0)
-        groq_client = Groq(api_key=GROQ_API_KEY, http_client=http_client)
-        model = groq_client
+        model = get_groq_client(GROQ_API_KEY)
         active_model = "groq"
     except:
         pass
 
+@st.cache_resource(show_spinner=False)
+def get_gemini_model(api_key):
+    """Configure the Gemini SDK and build its model once per process"""
+    # SDK pulls in gRPC, so only import it when a key is set
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-2.0-flash-exp')
+
 # Try Gemini second
 if model is None and GEMINI_API_KEY:
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        model = get_gemini_model(GEMINI_API_KEY)
         active_model = "gemini"
     except:
         pass
 
-# Try OpenAI third (with SSL verification disabled for corporate networks)
+# Try OpenAI third
 if model is None and OPENAI_API_KEY and OPENAI_AVAILABLE:
     try:
-        import httpx
-        http_client = httpx.Client(verify=False, timeout=60.0)
-        openai_client = OpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
-        model = openai_client
+        model = get_openai_client(OPENAI_API_KEY)
         active_model = "openai"
     except:
         pass
 
-def generate_ai_response(prompt):
+def is_rate_limited(error):
+    """Quota/rate-limit check on the error's HTTP status rather than its message text"""
+    # Groq/OpenAI errors carry status_code; Google API errors carry code
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    return status == 429
+
+AI_REQUEST_TIMEOUT = 30  # seconds per provider request
+AI_RETRY_ATTEMPTS = 3
+AI_BACKOFF_BASE = 0.5  # seconds, doubled after each failed attempt
+
+def is_transient(error):
+    """Timeouts, connection drops, rate limits and 5xx responses; auth and bad requests are not"""
+    if isinstance(error, TRANSIENT_AI_ERRORS) or is_rate_limited(error):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    return isinstance(status, int) and status >= 500
+
+def call_with_backoff(request, attempts=AI_RETRY_ATTEMPTS, base=AI_BACKOFF_BASE):
+    """Run a provider request, retrying transient failures with exponential backoff and jitter"""
+    for attempt in range(attempts):
+        try:
+            return request()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_transient(e):
+                raise
+            time.sleep(base * 2 ** attempt + random.uniform(0, 0.25))
+
+def call_ai_providers(prompt):
     """Generate AI response with fallback support"""
-    global model, active_model
-    
     if model is None:
         return "AI not configured. Please set API keys."
     
-    errors_encountered = []
-    
     # Try primary model first
     try:
         if active_model == "groq":
             # Use llama-3.1-8b-instant (supported and fast)
-            response = model.chat.completions.create(
+            response = call_with_backoff(lambda: model.chat.completions.create(
                 model="llama-3.1-8b-instant",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=2000,
-                timeout=60
-            )
+                timeout=AI_REQUEST_TIMEOUT
+            ))
             return response.choices[0].message.content
         
         elif active_model == "gemini":
-            response = model.generate_content(prompt)
+            response = call_with_backoff(lambda: model.generate_content(
+                prompt, request_options={"timeout": AI_REQUEST_TIMEOUT}
+            ))
             return response.text
         
         elif active_model == "openai":
-            response = model.chat.completions.create(
+            response = call_with_backoff(lambda: model.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=2000,
-                timeout=30
-            )
+                timeout=AI_REQUEST_TIMEOUT
+            ))
             return response.choices[0].message.content
     
     except Exception as e:
-        error_msg = str(e).lower()
-        errors_encountered.append(f"{active_model}: {str(e)}")
-        
-        # Try Groq fallback (if not already using it) - try multiple times
-        if active_model != "groq" and GROQ_API_KEY and GROQ_AVAILABLE:
-            for attempt in range(2):  # Try twice
-                try:
-                    import httpx
-                    http_client = httpx.Client(verify=False, timeout=60.0)
-                    groq_client = Groq(api_key=GROQ_API_KEY, http_client=http_client)
-                    response = groq_client.chat.completions.create(
-                        model="llama-3.1-8b-instant",
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.7,
-                        max_tokens=2000
-                    )
-                    model = groq_client
-                    active_model = "groq"
-                    return response.choices[0].message.content
-                except Exception as groq_error:
-                    if attempt == 1:  # Only log on last attempt
-                        errors_encountered.append(f"Groq (retry {attempt+1}): {str(groq_error)}")
-                    import time
-                    time.sleep(1)  # Wait 1 second between retries
-        
-        # Try Gemini fallback (if not already using it and not quota error)
-        if active_model != "gemini" and GEMINI_API_KEY and "quota" not in error_msg and "429" not in error_msg:
-            try:
-                genai.configure(api_key=GEMINI_API_KEY)
-                fallback_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                response = fallback_model.generate_content(prompt)
-                model = fallback_model
-                active_model = "gemini"
-                return response.text
-            except Exception as gemini_error:
-                errors_encountered.append(f"Gemini: {str(gemini_error)}")
-        
-        # Try OpenAI fallback (if not already using it)
-        if active_model != "openai" and OPENAI_API_KEY and OPENAI_AVAILABLE:
-            try:
-                import httpx
-                http_client = httpx.Client(verify=False, timeout=60.0)
-                openai_client = OpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
-                response = openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7,
-                    max_tokens=2000
-                )
-                model = openai_client
-                active_model = "openai"
-                return response.choices[0].message.content
-            except Exception as openai_error:
-                errors_encountered.append(f"OpenAI: {str(openai_error)}")
-        
-        # Return all errors for debugging
-        return f"All AI services failed. Errors: {' | '.join(errors_encountered)}"
+        return call_fallback_providers(prompt, e)
+
+def call_fallback_providers(prompt, primary_error):
+    """Try the other configured providers after the active one failed with primary_error"""
+    global model, active_model
+    
+    rate_limited = is_rate_limited(primary_error)
+    errors_encountered = [f"{active_model}: {str(primary_error)}"]
+    
+    # Try Groq fallback (if not already using it) - retried with backoff
+    if active_model != "groq" and GROQ_API_KEY and GROQ_AVAILABLE:
+        try:
+            groq_client = get_groq_client(GROQ_API_KEY)
+            response = call_with_backoff(lambda: groq_client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=2000,
+                timeout=AI_REQUEST_TIMEOUT
+            ))
+            model = groq_client
+            active_model = "groq"
+            return response.choices[0].message.content
+        except Exception as groq_error:
+            errors_encountered.append(f"Groq: {str(groq_error)}")
+    
+    # Try Gemini fallback (if not already using it and not quota error)
+    if active_model != "gemini" and GEMINI_API_KEY and not rate_limited:
+        try:
+            fallback_model = get_gemini_model(GEMINI_API_KEY)
+            response = call_with_backoff(lambda: fallback_model.generate_content(
+                prompt, request_options={"timeout": AI_REQUEST_TIMEOUT}
+            ))
+            model = fallback_model
+            active_model = "gemini"
+            return response.text
+        except Exception as gemini_error:
+            errors_encountered.append(f"Gemini: {str(gemini_error)}")
+    
+    # Try OpenAI fallback (if not already using it)
+    if active_model != "openai" and OPENAI_API_KEY and OPENAI_AVAILABLE:
+        try:
+            openai_client = get_openai_client(OPENAI_API_KEY)
+            response = call_with_backoff(lambda: openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=2000,
+                timeout=AI_REQUEST_TIMEOUT
+            ))
+            model = openai_client
+            active_model = "openai"
+            return response.choices[0].message.content
+        except Exception as openai_error:
+            errors_encountered.append(f"OpenAI: {str(openai_error)}")
+    
+    # Return all errors for debugging
+    return f"All AI services failed. Errors: {' | '.join(errors_encountered)}"
+
+AI_RESPONSE_TTL = 3600  # seconds
+AI_RESPONSE_CACHE_ENTRIES = 256
+AI_FAILURE_PREFIXES = ("AI not configured", "All AI services failed")
+AI_EMPTY_RESPONSE = "The AI service returned an empty response. Please try again."
+
+@st.cache_resource(show_spinner=False)
+def get_ai_response_cache():
+    """Process-wide answer map shared by every session; the lock guards concurrent reruns"""
+    return TTLCache(maxsize=AI_RESPONSE_CACHE_ENTRIES, ttl=AI_RESPONSE_TTL), threading.Lock()
+
+def get_response_cache_key(prompt):
+    """Answers are keyed on the active model and a digest of the prompt"""
+    return active_model, hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+def lookup_ai_response(cache_key):
+    cache, lock = get_ai_response_cache()
+    with lock:
+        return cache.get(cache_key)
+
+def store_ai_response(cache_key, response):
+    """Keep successful answers only; empty replies and failure messages are never stored"""
+    if isinstance(response, str) and response and not response.startswith(AI_FAILURE_PREFIXES):
+        cache, lock = get_ai_response_cache()
+        with lock:
+            cache[cache_key] = response
+
+def generate_ai_response(prompt):
+    """Generate AI response, reusing the answer when the same prompt was asked recently"""
+    cache_key = get_response_cache_key(prompt)
+    cached = lookup_ai_response(cache_key)
+    if cached is not None:
+        return cached
+    
+    response = call_ai_providers(prompt)
+    # Chat completions may return content=None; report it rather than failing the caller
+    if not (isinstance(response, str) and response):
+        return AI_EMPTY_RESPONSE
+    store_ai_response(cache_key, response)
+    return response
+
+def stream_ai_response(prompt):
+    """Yield the AI response as it is generated, for st.write_stream"""
+    cache_key = get_response_cache_key(prompt)
+    cached = lookup_ai_response(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    
+    if active_model not in ("groq", "openai"):
+        # Gemini answers arrive whole through the blocking chain
+        yield generate_ai_response(prompt)
+        return
+    
+    chunks = []
+    try:
+        stream = call_with_backoff(lambda: model.chat.completions.create(
+            model="llama-3.1-8b-instant" if active_model == "groq" else "gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=2000,
+            timeout=AI_REQUEST_TIMEOUT,
+            stream=True
+        ))
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                chunks.append(text)
+                yield text
+    except Exception as e:
+        if chunks:
+            # Part of the answer is already on screen, so don't append a second one
+            raise
+        # The primary provider just failed, so go straight to the others
+        response = call_fallback_providers(prompt, e)
+        if not (isinstance(response, str) and response):
+            response = AI_EMPTY_RESPONSE
+        store_ai_response(cache_key, response)
+        yield response
+        return
+    
+    if chunks:
+        store_ai_response(cache_key, "".join(chunks))
+    else:
+        yield AI_EMPTY_RESPONSE
 
 # Load external CSS file
+@st.cache_resource(show_spinner=False)
 def load_css():
+    """Read style.css once per process instead of on every rerun"""
     with open("style.css") as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+        return f'<style>{f.read()}</style>'
 
-try:
-    load_css()
-except:
-    # Fallback inline CSS if file not found
-    st.markdown("""
+# Fallback inline CSS if style.css is not found
+FALLBACK_CSS = """
     <style>
         .main {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
@@ -220,10 +360,10 @@ except:
             accent-color: #667eea !important;
         }
     </style>
-    """, unsafe_allow_html=True)
+"""
 
-# Keep minimal inline CSS for compatibility
-st.markdown("""
+# Minimal inline CSS kept for compatibility
+BASE_CSS = """
 <style>
     /* Ensure main styling */
     .main {
@@ -742,11 +882,10 @@ st.markdown("""
         background-color: transparent !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# Apply High Contrast Mode CSS if enabled
-if st.session_state.high_contrast:
-    st.markdown("""
+# High Contrast Mode overrides
+HIGH_CONTRAST_CSS = """
     <style>
         /* High Contrast Mode Overrides */
         .main {
@@ -1050,11 +1189,10 @@ if st.session_state.high_contrast:
             color: #CCCC00 !important;
         }
     </style>
-    """, unsafe_allow_html=True)
+"""
 
-# Apply Magnifier Mode CSS if enabled
-if st.session_state.magnifier:
-    st.markdown("""
+# Magnifier Mode - larger text
+MAGNIFIER_CSS = """
     <style>
         /* Magnifier Mode - Larger Text */
         body, p, span, div, label, .stMarkdown, .stText {
@@ -1091,7 +1229,23 @@ if st.session_state.magnifier:
             font-size: 1.5rem !important;
         }
     </style>
-    """, unsafe_allow_html=True)
+"""
+
+try:
+    css_blocks = [load_css(), BASE_CSS]
+except:
+    css_blocks = [FALLBACK_CSS, BASE_CSS]
+
+# Apply High Contrast Mode CSS if enabled
+if st.session_state.high_contrast:
+    css_blocks.append(HIGH_CONTRAST_CSS)
+
+# Apply Magnifier Mode CSS if enabled
+if st.session_state.magnifier:
+    css_blocks.append(MAGNIFIER_CSS)
+
+# Inject all styles as a single element
+st.markdown("".join(css_blocks), unsafe_allow_html=True)
 
 # Text-to-Speech Function
 def speak_text(text):
@@ -1133,30 +1287,34 @@ def speak_text(text):
     return False
 
 # Header with Accessibility Controls
-st.markdown("""
+HEADER_HTML = """
 <div style='margin-bottom: 1.5rem;'>
     <h1 style='margin: 0; color: #1565C0; font-size: 3.5rem; font-weight: 700;'>BRIDGE</h1>
     <span style='color: #424242; font-size: 1.4rem; font-weight: 400;'>AI Tool to Help Personalise/Visualise RWE</span>
 </div>
-""", unsafe_allow_html=True)
+"""
+
+# Plain HTML, so skip the markdown parser
+st.html(HEADER_HTML)
+
+def toggle_setting(name):
+    """Flip a session flag in a button callback so the click costs a single rerun"""
+    st.session_state[name] = not st.session_state[name]
 
 st.markdown("**Accessibility**")
 acc_col1, acc_col2, acc_col3 = st.columns(3)
 
 with acc_col1:
-    if st.button("Contrast" if not st.session_state.high_contrast else "✓ Contrast", key="hc_btn", use_container_width=True):
-        st.session_state.high_contrast = not st.session_state.high_contrast
-        st.rerun()
+    st.button("Contrast" if not st.session_state.high_contrast else "✓ Contrast", key="hc_btn", use_container_width=True,
+              on_click=toggle_setting, args=("high_contrast",))
 
 with acc_col2:
-    if st.button("Magnify" if not st.session_state.magnifier else "✓ Magnify", key="mag_btn", use_container_width=True):
-        st.session_state.magnifier = not st.session_state.magnifier
-        st.rerun()
+    st.button("Magnify" if not st.session_state.magnifier else "✓ Magnify", key="mag_btn", use_container_width=True,
+              on_click=toggle_setting, args=("magnifier",))
 
 with acc_col3:
-    if st.button("TTS" if not st.session_state.tts_enabled else "TTS ON", key="tts_btn", use_container_width=True):
-        st.session_state.tts_enabled = not st.session_state.tts_enabled
-        st.rerun()
+    st.button("TTS" if not st.session_state.tts_enabled else "TTS ON", key="tts_btn", use_container_width=True,
+              on_click=toggle_setting, args=("tts_enabled",))
 
 st.markdown("---")
 
@@ -1166,6 +1324,8 @@ def extract_text_from_pptx(file):
     if not PPTX_SUPPORT:
         return "PowerPoint support not available. Install python-pptx.", []
     
+    from pptx import Presentation
+    
     prs = Presentation(file)
     text_content = []
     tables_data = []
@@ -1173,15 +1333,13 @@ def extract_text_from_pptx(file):
     for slide_num, slide in enumerate(prs.slides, 1):
         slide_text = []
         for shape in slide.shapes:
-            if hasattr(shape, "text") and shape.text.strip():
-                slide_text.append(shape.text)
+            # shape.text walks the XML on every access, so read it once
+            text = getattr(shape, "text", "")
+            if text.strip():
+                slide_text.append(text)
             
             if shape.has_table:
-                table = shape.table
-                table_data = []
-                for row in table.rows:
-                    row_data = [cell.text for cell in row.cells]
-                    table_data.append(row_data)
+                table_data = [[cell.text for cell in row.cells] for row in shape.table.rows]
                 if table_data:
                     tables_data.append({"slide": slide_num, "data": table_data})
         
@@ -1206,19 +1364,526 @@ def parse_json_to_dataframe(file):
         st.error(f"Error parsing JSON: {str(e)}")
         return pd.DataFrame()
 
+# Text columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+def optimize_dtypes(df):
+    """Parse date columns, shrink integer columns and convert low-cardinality text to category"""
+    # Columns are addressed by position: PowerPoint tables with blank header cells
+    # repeat labels, and df[label] would then return a DataFrame
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        
+        # Parse date-like columns once so later min/max/sort work on datetime64 values.
+        # Only ISO 8601 values are converted: dd/mm vs mm/dd can't be told apart reliably
+        if pd.api.types.is_object_dtype(series) and 'date' in str(col).lower():
+            try:
+                series = pd.to_datetime(series, format='ISO8601', cache=True)
+                df.isetitem(i, series)
+            except (ValueError, TypeError):
+                # Leave columns that don't parse cleanly as text
+                pass
+        
+        if pd.api.types.is_object_dtype(series):
+            try:
+                n_unique = series.nunique()
+            except TypeError:
+                # Unhashable values such as nested JSON lists
+                continue
+            if n_unique <= len(df) * CATEGORY_MAX_UNIQUE_RATIO:
+                df.isetitem(i, series.astype('category'))
+        
+        # Integers downcast losslessly to the smallest width that holds their range;
+        # floats stay float64 so statistics and correlations keep full precision
+        elif pd.api.types.is_integer_dtype(series):
+            df.isetitem(i, pd.to_numeric(series, downcast='integer'))
+    return df
+
+# Per-dataset caches keep only the most recent uploads so memory stays bounded
+DATASET_CACHE_ENTRIES = 4
+
+def get_data_key(file_type, source):
+    """Content fingerprint of an upload or pasted text, used to key the per-dataset caches"""
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    return f"{file_type}:{hashlib.sha256(source).hexdigest()}"
+
+# The cached helpers below take the data key and an underscore-prefixed DataFrame,
+# which Streamlit skips when hashing, so a cache hit never re-hashes the whole frame
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def load_tabular_file(data_key, _file_bytes, file_name):
+    """Parse an uploaded CSV/Excel file once per distinct file contents"""
+    if file_name.endswith('.csv'):
+        try:
+            _file_bytes.decode('utf-8')
+        except UnicodeDecodeError:
+            # Arrow would return non-UTF-8 text as raw bytes, so decode it with the C parser
+            df = pd.read_csv(BytesIO(_file_bytes), encoding='latin-1')
+        else:
+            try:
+                # Arrow's multithreaded parser (pyarrow ships with Streamlit); numpy dtypes are kept
+                df = pd.read_csv(BytesIO(_file_bytes), engine='pyarrow')
+            except ValueError:
+                # Arrow rejects rows with fewer fields than the header; the C parser pads them
+                df = pd.read_csv(BytesIO(_file_bytes), encoding='utf-8')
+    else:
+        df = pd.read_excel(BytesIO(_file_bytes))
+    return optimize_dtypes(df)
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def load_pptx_content(data_key, _file_bytes):
+    """Extract a presentation's text and tables once per distinct file contents"""
+    return extract_text_from_pptx(BytesIO(_file_bytes))
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def load_json_file(data_key, _file_bytes):
+    """Parse an uploaded JSON file once per distinct file contents"""
+    return optimize_dtypes(parse_json_to_dataframe(BytesIO(_file_bytes)))
+
+# Upper bound on points drawn in a 3D scatter plot
+MAX_PLOT_POINTS = 5000
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def sample_rows(data_key, _df, n, seed=42):
+    """Deterministic row sample, drawn once per dataset and size"""
+    return _df.sample(n, random_state=seed)
+
+def downsample_for_plot(data_key, df, max_points=MAX_PLOT_POINTS):
+    """Limit the rows sent to the browser for point-cloud charts"""
+    if len(df) <= max_points:
+        return df
+    # Rows have no natural ordering here, so use a fixed-seed sample rather than LTTB
+    return sample_rows(data_key, df, max_points)
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def get_basic_statistics(data_key, _df):
+    """Compute column details and summary statistics once per dataset"""
+    non_null = _df.count().values
+    column_info = pd.DataFrame({
+        'Column Name': _df.columns,
+        'Data Type': _df.dtypes.astype(str).values,
+        'Non-Null Count': non_null,
+        'Null Count': len(_df) - non_null,
+        'Unique Values': _df.nunique().values
+    })
+    return {
+        'total_rows': len(_df),
+        'total_columns': len(_df.columns),
+        'numeric_columns': _df.select_dtypes(include=['number']).columns.tolist(),
+        'categorical_columns': _df.select_dtypes(include=['object', 'category']).columns.tolist(),
+        'column_info': column_info,
+        'describe': _df.describe()
+    }
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def build_data_summary(data_key, _df):
+    """Dataset section of the AI analysis prompt, built once per dataset"""
+    # Limit data to prevent token overflow
+    sample_size = min(5, len(_df))
+    cols_to_show = min(10, len(_df.columns))
+    
+    return f"""
+Dataset Overview:
+- Total Rows: {len(_df)}
+- Total Columns: {len(_df.columns)}
+- Column Names: {', '.join(_df.columns.tolist()[:cols_to_show])}{'...' if len(_df.columns) > cols_to_show else ''}
+
+Data Types (first {cols_to_show} columns):
+{_df.dtypes.head(cols_to_show).to_string()}
+
+Statistical Summary (first {cols_to_show} numeric columns):
+{get_basic_statistics(data_key, _df)['describe'].iloc[:, :cols_to_show].to_string()}
+
+Sample Data (first {sample_size} rows, first {cols_to_show} columns):
+{_df.head(sample_size).iloc[:, :cols_to_show].to_string()}
+"""
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def build_chat_data_context(data_key, _df):
+    """Data section of the chat prompt, identical for every question about a dataset"""
+    context = f"\n\nData Context:\n"
+    context += f"- Total Rows: {len(_df)}\n"
+    context += f"- Total Columns: {len(_df.columns)}\n"
+    context += f"- Columns: {', '.join(_df.columns.tolist()[:15])}\n\n"
+    
+    # Add statistical summary for numeric columns
+    numeric_cols = _df.select_dtypes(include=['number']).columns[:5]
+    if len(numeric_cols) > 0:
+        # Read mean/median/std from the cached describe() rather than rescanning each column
+        describe = get_basic_statistics(data_key, _df)['describe']
+        context += "Key Numeric Statistics:\n"
+        for col in numeric_cols:
+            col_stats = describe[col]
+            context += f"  - {col}: mean={col_stats['mean']:.2f}, median={col_stats['50%']:.2f}, std={col_stats['std']:.2f}\n"
+    
+    # Add value counts for categorical columns
+    categorical_cols = _df.select_dtypes(include=['object', 'category']).columns[:3]
+    if len(categorical_cols) > 0:
+        context += "\nKey Categorical Distributions:\n"
+        for col in categorical_cols:
+            top_values = _df[col].value_counts().head(5).to_dict()
+            context += f"  - {col}: {top_values}\n"
+    
+    # Add sample rows
+    context += f"\nSample Data (first 3 rows):\n{_df.head(3).to_string()}"
+    return context
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def get_correlation_matrix(data_key, _df):
+    """Pairwise correlation of the numeric columns, computed once per dataset"""
+    return _df.select_dtypes(include=['number']).corr()
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def export_csv_bytes(data_key, _df, index=False):
+    """Encoded CSV export of a frame, serialised once per dataset"""
+    return _df.to_csv(index=index).encode('utf-8')
+
+# Figures are shared instances (cache_resource) so hits skip a pickle round trip of
+# the trace data; callers only read them, never mutate.
+@st.cache_resource(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES * 3)
+def build_category_bar_chart(data_key, _df, cat_col):
+    """Bar chart of the 10 most frequent values in a column, built once per dataset"""
+    import plotly.graph_objects as go
+    
+    value_counts = _df[cat_col].value_counts().head(10)
+    
+    fig = go.Figure(data=[go.Bar(
+        x=value_counts.values,
+        y=value_counts.index,
+        orientation='h',
+        marker_color='#2196F3',
+        marker_line_color='#1565C0',
+        marker_line_width=1.5
+    )])
+    
+    fig.update_layout(
+        title=dict(
+            text=f'Top Values in {cat_col}',
+            font=dict(color='#1565C0', size=16)
+        ),
+        xaxis=dict(title='Count', gridcolor='#E3F2FD'),
+        yaxis=dict(title=cat_col, gridcolor='#E3F2FD'),
+        paper_bgcolor='#FFFFFF',
+        plot_bgcolor='#FFFFFF',
+        font=dict(color='#212121'),
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+@st.cache_resource(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def build_scatter_3d(data_key, _plot_df, x_col, y_col, z_col, color_col):
+    """3D scatter of three numeric columns, optionally coloured by a category"""
+    import plotly.graph_objects as go
+    
+    if color_col:
+        # Alternate the two theme blues by category code (order of first appearance)
+        codes, _ = pd.factorize(_plot_df[color_col], use_na_sentinel=False)
+
+        fig = go.Figure(data=[go.Scatter3d(
+            x=_plot_df[x_col],
+            y=_plot_df[y_col],
+            z=_plot_df[z_col],
+            mode='markers',
+            marker=dict(
+                size=6,
+                color=codes % 2,
+                colorscale=[[0, '#2196F3'], [1, '#1565C0']],
+                cmin=0,
+                cmax=1,
+                line=dict(color='#1976D2', width=0.5)
+            ),
+            text=f"{color_col}: " + _plot_df[color_col].astype(str),
+            hovertemplate=f'<b>%{{text}}</b><br>{x_col}: %{{x}}<br>{y_col}: %{{y}}<br>{z_col}: %{{z}}<extra></extra>'
+        )])
+    else:
+        fig = go.Figure(data=[go.Scatter3d(
+            x=_plot_df[x_col],
+            y=_plot_df[y_col],
+            z=_plot_df[z_col],
+            mode='markers',
+            marker=dict(
+                size=6,
+                color='#2196F3',
+                line=dict(color='#1976D2', width=0.5)
+            ),
+            hovertemplate=f'{x_col}: %{{x}}<br>{y_col}: %{{y}}<br>{z_col}: %{{z}}<extra></extra>'
+        )])
+
+    fig.update_layout(
+        title=dict(
+            text=f'3D Scatter: {x_col} vs {y_col} vs {z_col}',
+            font=dict(color='#1565C0', size=18)
+        ),
+        scene=dict(
+            xaxis=dict(title=x_col, gridcolor='#E3F2FD', backgroundcolor='#FFFFFF'),
+            yaxis=dict(title=y_col, gridcolor='#E3F2FD', backgroundcolor='#FFFFFF'),
+            zaxis=dict(title=z_col, gridcolor='#E3F2FD', backgroundcolor='#FFFFFF'),
+        ),
+        paper_bgcolor='#FFFFFF',
+        font=dict(color='#212121'),
+        height=600
+    )
+    return fig
+
+@st.cache_resource(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def build_ar_figure(data_key, _plot_df, x_col, y_col, z_col, n_rows):
+    """Colour-scaled 3D scatter used for the AR export; n_rows tells the sampled and full figures apart"""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(data=[go.Scatter3d(
+        x=_plot_df[x_col],
+        y=_plot_df[y_col],
+        z=_plot_df[z_col],
+        mode='markers',
+        marker=dict(
+            size=8,
+            color=_plot_df[z_col] if z_col in _plot_df.columns else '#2196F3',
+            colorscale=[[0, '#E3F2FD'], [0.5, '#1976D2'], [1, '#1565C0']],
+            line=dict(color='#1976D2', width=1),
+            showscale=True
+        ),
+        hovertemplate=f'{x_col}: %{{x}}<br>{y_col}: %{{y}}<br>{z_col}: %{{z}}<extra></extra>'
+    )])
+
+    fig.update_layout(
+        title=dict(
+            text=f'AR-Ready 3D Visualisation',
+            font=dict(color='#1565C0', size=20)
+        ),
+        scene=dict(
+            xaxis=dict(title=x_col, backgroundcolor='#FFFFFF', gridcolor='#E3F2FD'),
+            yaxis=dict(title=y_col, backgroundcolor='#FFFFFF', gridcolor='#E3F2FD'),
+            zaxis=dict(title=z_col, backgroundcolor='#FFFFFF', gridcolor='#E3F2FD'),
+            camera=dict(
+                eye=dict(x=1.5, y=1.5, z=1.5)
+            )
+        ),
+        paper_bgcolor='#FFFFFF',
+        font=dict(color='#212121'),
+        height=700
+    )
+    return fig
+
+# Characters of the latest analysis included in chat prompts
+ANALYSIS_PREVIEW_CHARS = 1000
+
+# Quick-question buttons shown above the chat panels
+EXAMPLE_QUESTIONS = (
+    "What are the key trends in this data?",
+    "Summarize the main findings",
+    "What patterns should I investigate?",
+    "Explain the data structure"
+)
+
+FOLLOWUP_QUESTIONS = (
+    "Explain the clinical significance",
+    "What are the limitations?",
+    "Compare to typical outcomes",
+    "What should I investigate further?"
+)
+
+def set_clicked_question(name, question):
+    """Record a quick-question click in a button callback so it is handled in the same rerun"""
+    st.session_state[name] = question
+
+@st.fragment
+def render_chat_assistant(extracted_text):
+    """Chat panel, run as a fragment so chat interactions only rerun this block"""
+    # Example question buttons
+    st.markdown("**Quick Start:**")
+    example_cols = st.columns(4)
+    
+    if 'example_question_clicked' not in st.session_state:
+        st.session_state.example_question_clicked = None
+    
+    for idx, col in enumerate(example_cols):
+        with col:
+            st.button(EXAMPLE_QUESTIONS[idx], key=f"example_q_{idx}", use_container_width=True,
+                      on_click=set_clicked_question, args=("example_question_clicked", EXAMPLE_QUESTIONS[idx]))
+    
+    st.markdown("")
+
+    # Chat interface
+    chat_col1, chat_col2 = st.columns([4, 1])
+
+    with chat_col1:
+        general_prompt = st.chat_input("Ask AI anything about your data or analysis...")
+
+    with chat_col2:
+        if st.session_state.get('chatbot_messages', []):
+            if st.button("Clear Chat", type="secondary", use_container_width=True, key="clear_general_chat"):
+                st.session_state.chatbot_messages = []
+                st.rerun(scope="fragment")
+
+    # Display chat messages
+    if st.session_state.get('chatbot_messages', []):
+        with st.container():
+            for message in st.session_state.chatbot_messages:
+                with st.chat_message(message["role"]):
+                    st.markdown(message["content"], unsafe_allow_html=True)
+
+    # Handle new messages from general chat (including example questions)
+    active_prompt = general_prompt if general_prompt and general_prompt.strip() else st.session_state.example_question_clicked
+    
+    if active_prompt:
+        # Check if this message was already processed
+        if 'last_general_prompt' not in st.session_state or st.session_state.last_general_prompt != active_prompt:
+            st.session_state.last_general_prompt = active_prompt
+            st.session_state.example_question_clicked = None  # Reset example question
+            
+            # Add user message to chat history
+            st.session_state.chatbot_messages.append({"role": "user", "content": active_prompt})
+            
+            # Build context from analysis if available
+            context = ""
+            if st.session_state.analysis_preview:
+                context += f"\n\nPrevious Analysis:\n{st.session_state.analysis_preview}"
+            
+            # Check for dataframe data
+            if 'df' in st.session_state and st.session_state.get('df') is not None:
+                context += build_chat_data_context(st.session_state.get('data_key'), st.session_state['df'])
+            
+            # Check for text/document data
+            elif extracted_text:
+                context += f"\n\nDocument Content ({len(extracted_text)} characters):\n"
+                # Include substantial portion of text (up to 4000 chars for better context)
+                max_text_chars = 4000
+                context += extracted_text[:max_text_chars]
+                if len(extracted_text) > max_text_chars:
+                    context += "\n...[Content truncated]"
+            
+            # Create HCP-focused prompt with user profile
+            user_profile = st.session_state.get('user_profile', {})
+            knowledge = user_profile.get('knowledge_level', 'Intermediate')
+            language = user_profile.get('language', 'English')
+            hcp_role = user_profile.get('hcp_type', 'Healthcare Professional')
+            
+            full_prompt = f"""You are MedInsight, an AI assistant helping Healthcare Professionals (HCPs) analyze Real-World Evidence (RWE) data.
+
+User Profile:
+- Role: {hcp_role}
+- Knowledge Level: {knowledge}
+- Language: {language}
+
+DATA AVAILABLE TO YOU:
+{context}
+
+INSTRUCTIONS:
+Answer the user's question based SPECIFICALLY on the data provided above. Use actual numbers, column names, and values from the dataset.
+- Reference specific findings from the data (e.g., "The average weight change was -11.3 kg in the Mounjaro group")
+- Cite actual statistics and distributions shown in the data
+- Focus on the treatments, outcomes, and patient characteristics present in THIS dataset
+- Tailor complexity to {knowledge} level
+- If the data doesn't contain information to answer the question, acknowledge this and suggest related insights from available data
+
+Keep your response concise (3-4 paragraphs max), clinically relevant, and evidence-based using the actual data provided.
+
+User Question: {active_prompt}
+
+Response:"""
+            
+            # Generate AI response
+            try:
+                with st.spinner("AI is thinking..."):
+                    response = generate_ai_response(full_prompt)
+                
+                # Add assistant response to chat history
+                st.session_state.chatbot_messages.append({"role": "assistant", "content": response})
+                
+                # Auto-play TTS for chatbot response if enabled
+                if st.session_state.tts_enabled:
+                    speak_text(response)
+                
+                # Rerun to display new messages
+                st.rerun(scope="fragment")
+                    
+            except Exception as e:
+                st.error(f"Error generating response: {str(e)}")
+
+def set_input_method(method):
+    """Switch input method in a button callback so the click costs a single rerun"""
+    st.session_state.input_method = method
+
+def clear_text_input():
+    """Empty the text box in a callback, before the widget is drawn again"""
+    st.session_state.text_input_area = ""
+
+# User profile choices; the part before " - " is what the prompts use
+KNOWLEDGE_LEVEL_OPTIONS = (
+    "Beginner - New to RWE/Clinical Data",
+    "Intermediate - Some experience with data analysis",
+    "Advanced - Experienced with RWE studies",
+    "Expert - Clinical research professional"
+)
+
+COUNTRY_OPTIONS = (
+    "United States - English",
+    "United Kingdom - English",
+    "Canada - English/French",
+    "Australia - English",
+    "Germany - German",
+    "France - French",
+    "Spain - Spanish",
+    "Italy - Italian",
+    "Japan - Japanese",
+    "China - Mandarin",
+    "Brazil - Portuguese",
+    "India - English/Hindi",
+    "Other"
+)
+
+HCP_TYPE_OPTIONS = (
+    "Physician - General Practice",
+    "Physician - Specialist",
+    "Nurse Practitioner",
+    "Pharmacist",
+    "Researcher/Scientist",
+    "Clinical Trial Coordinator",
+    "Healthcare Administrator",
+    "Medical Affairs",
+    "Regulatory Affairs",
+    "Data Analyst/Statistician",
+    "Student/Trainee",
+    "Other"
+)
+
+INSTRUCTIONS_MD = """
+### How to use:
+1. **Choose** between uploading a file or entering text directly
+2. **Upload** your file (Excel, CSV, PowerPoint, Text, JSON) OR **paste** text in the text box
+3. **Review** the data preview and details
+4. **Click** "Ask AI to Analyze" to get AI-powered insights
+5. **Ask questions** using the AI chatbot
+6. **Generate visualizations** including 3D AR graphs
+7. **Download** your results as needed
+
+### Supported formats:
+- **Data Files**: Excel (.xlsx, .xls), CSV
+- **PowerPoint**: .pptx (extracts tables and text)
+- **Text**: .txt, .md files
+- **JSON**: Structured data files
+- **Direct Text Input**: Paste any text for AI analysis
+
+### What you'll get:
+- **Quick overview** of your data or content structure
+- **AI-powered insights** about patterns and trends
+- **Key statistics** for numeric columns
+- **Clinical recommendations** for further analysis
+"""
+
 # Data Input Section
 st.markdown("#### Choose input method:")
 col1, col2 = st.columns(2)
 
 with col1:
-    if st.button("Upload File", use_container_width=True, type="primary" if st.session_state.input_method == "Upload File" else "secondary"):
-        st.session_state.input_method = "Upload File"
-        st.rerun()
+    st.button("Upload File", use_container_width=True, type="primary" if st.session_state.input_method == "Upload File" else "secondary",
+              on_click=set_input_method, args=("Upload File",))
 
 with col2:
-    if st.button("Enter Text Directly", use_container_width=True, type="primary" if st.session_state.input_method == "Enter Text Directly" else "secondary"):
-        st.session_state.input_method = "Enter Text Directly"
-        st.rerun()
+    st.button("Enter Text Directly", use_container_width=True, type="primary" if st.session_state.input_method == "Enter Text Directly" else "secondary",
+              on_click=set_input_method, args=("Enter Text Directly",))
 
 input_method = st.session_state.input_method
 
@@ -1265,28 +1930,21 @@ if input_method == "Upload File":
 else:
     # Mobile-friendly text input with submit button
     st.markdown("#### Enter Text (Mobile Supported)")
-    text_input = st.text_area(
-        "Enter your data or analysis:",
-        height=200,
-        placeholder="Paste your text, data, or analysis here...\n\nYou can paste:\n- CSV data\n- Analysis text\n- Research findings\n- Any text for AI analysis",
-        help="Enter any text for AI analysis and insights",
-        key="text_input_area"
-    )
-    
-    # Add submit button for mobile users
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        submit_text = st.button("Submit Text", type="primary", use_container_width=True, help="Click to process your text")
-    with col2:
-        clear_text = st.button("Clear", use_container_width=True, help="Clear text input")
-    
-    if clear_text:
-        st.session_state.text_input_area = ""
-        st.rerun()
-    
-    # Only process if submit button is clicked or text exists
-    if not submit_text and not text_input:
-        text_input = None
+    # Form so typing doesn't rerun the page; the text is only sent on Submit
+    with st.form("text_input_form", border=False):
+        text_input = st.text_area(
+            "Enter your data or analysis:",
+            height=200,
+            placeholder="Paste your text, data, or analysis here...\n\nYou can paste:\n- CSV data\n- Analysis text\n- Research findings\n- Any text for AI analysis",
+            help="Enter any text for AI analysis and insights",
+            key="text_input_area"
+        )
+        
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.form_submit_button("Submit Text", type="primary", use_container_width=True, help="Click to process your text")
+        with col2:
+            st.form_submit_button("Clear", use_container_width=True, help="Clear text input", on_click=clear_text_input)
     
     file_type = "Text Input"
 
@@ -1301,53 +1959,21 @@ if uploaded_file is not None or (text_input and text_input.strip()):
     with col1:
         knowledge_level = st.selectbox(
             "Knowledge Level",
-            [
-                "Beginner - New to RWE/Clinical Data",
-                "Intermediate - Some experience with data analysis",
-                "Advanced - Experienced with RWE studies",
-                "Expert - Clinical research professional"
-            ],
+            KNOWLEDGE_LEVEL_OPTIONS,
             help="Select your familiarity with Real-World Evidence and clinical data"
         )
     
     with col2:
         country = st.selectbox(
             "Country/Language",
-            [
-                "United States - English",
-                "United Kingdom - English",
-                "Canada - English/French",
-                "Australia - English",
-                "Germany - German",
-                "France - French",
-                "Spain - Spanish",
-                "Italy - Italian",
-                "Japan - Japanese",
-                "China - Mandarin",
-                "Brazil - Portuguese",
-                "India - English/Hindi",
-                "Other"
-            ],
+            COUNTRY_OPTIONS,
             help="Select your country and preferred language"
         )
     
     with col3:
         hcp_type = st.selectbox(
             "Healthcare Professional Type",
-            [
-                "Physician - General Practice",
-                "Physician - Specialist",
-                "Nurse Practitioner",
-                "Pharmacist",
-                "Researcher/Scientist",
-                "Clinical Trial Coordinator",
-                "Healthcare Administrator",
-                "Medical Affairs",
-                "Regulatory Affairs",
-                "Data Analyst/Statistician",
-                "Student/Trainee",
-                "Other"
-            ],
+            HCP_TYPE_OPTIONS,
             help="Select your role in healthcare"
         )
     
@@ -1365,42 +1991,42 @@ if uploaded_file is not None or (text_input and text_input.strip()):
     try:
         df = None
         extracted_text = None
+        data_key = None
         
         # Process based on input type
         if text_input and text_input.strip():
             extracted_text = text_input.strip()
+            data_key = get_data_key(file_type, extracted_text)
             st.success(f"Text input received: {len(extracted_text)} characters")
             
             # Try to parse as CSV
             try:
                 from io import StringIO
-                df = pd.read_csv(StringIO(extracted_text))
+                df = optimize_dtypes(pd.read_csv(StringIO(extracted_text)))
                 st.info("Detected CSV format in text - parsed as DataFrame")
             except:
                 pass
         
         elif uploaded_file is not None:
+            data_key = get_data_key(file_type, uploaded_file.getvalue())
+            
             if file_type == "Data File (Excel/CSV)":
                 with st.spinner("Loading data..."):
-                    if uploaded_file.name.endswith('.csv'):
-                        try:
-                            df = pd.read_csv(uploaded_file, encoding='utf-8')
-                        except UnicodeDecodeError:
-                            uploaded_file.seek(0)
-                            df = pd.read_csv(uploaded_file, encoding='latin-1')
-                    else:
-                        df = pd.read_excel(uploaded_file)
+                    df = load_tabular_file(data_key, uploaded_file.getvalue(), uploaded_file.name)
                 st.success(f"Loaded data: {len(df)} rows x {len(df.columns)} columns")
             
             elif file_type == "PDF Document":
                 if PDF_SUPPORT:
                     with st.spinner("Extracting text from PDF..."):
                         try:
+                            from PyPDF2 import PdfReader
+                            
                             pdf_reader = PdfReader(uploaded_file)
-                            extracted_text = ""
+                            page_texts = []
                             for page_num, page in enumerate(pdf_reader.pages, 1):
-                                extracted_text += f"\n--- Page {page_num} ---\n"
-                                extracted_text += page.extract_text()
+                                page_texts.append(f"\n--- Page {page_num} ---\n")
+                                page_texts.append(page.extract_text())
+                            extracted_text = "".join(page_texts)
                             
                             st.success(f"Extracted text from {len(pdf_reader.pages)} pages")
                             st.markdown("### PDF Content")
@@ -1412,7 +2038,7 @@ if uploaded_file is not None or (text_input and text_input.strip()):
                     st.error("PDF support not available. Install PyPDF2 package.")
             
             elif file_type == "PowerPoint Presentation":
-                extracted_text, tables = extract_text_from_pptx(uploaded_file)
+                extracted_text, tables = load_pptx_content(data_key, uploaded_file.getvalue())
                 st.markdown("### Extracted Content")
                 with st.expander("View extracted text", expanded=False):
                     st.text_area("PowerPoint Content", extracted_text, height=300, key="pptx_text")
@@ -1426,20 +2052,21 @@ if uploaded_file is not None or (text_input and text_input.strip()):
                             df_temp = pd.DataFrame(table_data[1:], columns=table_data[0])
                             st.dataframe(df_temp, use_container_width=True)
                             if df is None:
-                                df = df_temp
+                                df = optimize_dtypes(df_temp)
             
             elif file_type == "Text Document":
+                # Read the upload once and retry only the decode on failure
+                raw_bytes = uploaded_file.getvalue()
                 try:
-                    extracted_text = uploaded_file.read().decode('utf-8')
+                    extracted_text = raw_bytes.decode('utf-8')
                 except UnicodeDecodeError:
-                    uploaded_file.seek(0)
-                    extracted_text = uploaded_file.read().decode('latin-1')
+                    extracted_text = raw_bytes.decode('latin-1')
                 st.markdown("### Document Content")
                 with st.expander("View document text", expanded=False):
                     st.text_area("Text Content", extracted_text, height=300, key="text_content")
             
             elif file_type == "JSON Data":
-                df = parse_json_to_dataframe(uploaded_file)
+                df = load_json_file(data_key, uploaded_file.getvalue())
                 if not df.empty:
                     st.success(f"Loaded JSON data: {len(df)} records")
         
@@ -1448,28 +2075,21 @@ if uploaded_file is not None or (text_input and text_input.strip()):
         st.markdown("**Quick overview of your data:** The metrics below show you the size and structure of your dataset. Click the expandable sections to explore the details.")
         
         if df is not None and not df.empty:
+            basic_stats = get_basic_statistics(data_key, df)
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total Rows", f"{len(df):,}")
+                st.metric("Total Rows", f"{basic_stats['total_rows']:,}")
             with col2:
-                st.metric("Total Columns", len(df.columns))
+                st.metric("Total Columns", basic_stats['total_columns'])
             with col3:
-                numeric_cols = df.select_dtypes(include=['number']).columns
-                st.metric("Numeric Columns", len(numeric_cols))
+                st.metric("Numeric Columns", len(basic_stats['numeric_columns']))
             
             with st.expander("View Data Sample", expanded=True):
                 st.dataframe(df.head(10), use_container_width=True)
             
             # Column information
             with st.expander("Column Details"):
-                col_info = pd.DataFrame({
-                    'Column Name': df.columns,
-                    'Data Type': [str(dtype) for dtype in df.dtypes.values],
-                    'Non-Null Count': df.count().values,
-                    'Null Count': df.isnull().sum().values,
-                    'Unique Values': [df[col].nunique() for col in df.columns]
-                })
-                st.dataframe(col_info, use_container_width=True)
+                st.dataframe(basic_stats['column_info'], use_container_width=True)
         
         elif extracted_text:
             col1, col2 = st.columns(2)
@@ -1489,146 +2109,7 @@ if uploaded_file is not None or (text_input and text_input.strip()):
         st.markdown("### AI Chat Assistant")
         st.markdown("**Ask questions about your data** - Get insights, clarification, and analysis help. The AI has context about your uploaded data.")
 
-        # Example question buttons
-        st.markdown("**Quick Start:**")
-        example_cols = st.columns(4)
-        
-        example_questions = [
-            "What are the key trends in this data?",
-            "Summarize the main findings",
-            "What patterns should I investigate?",
-            "Explain the data structure"
-        ]
-        
-        if 'example_question_clicked' not in st.session_state:
-            st.session_state.example_question_clicked = None
-        
-        for idx, col in enumerate(example_cols):
-            with col:
-                if st.button(example_questions[idx], key=f"example_q_{idx}", use_container_width=True):
-                    st.session_state.example_question_clicked = example_questions[idx]
-                    st.rerun()
-        
-        st.markdown("")
-
-        # Chat interface
-        chat_col1, chat_col2 = st.columns([4, 1])
-
-        with chat_col1:
-            general_prompt = st.chat_input("Ask AI anything about your data or analysis...")
-
-        with chat_col2:
-            if st.session_state.get('chatbot_messages', []):
-                if st.button("Clear Chat", type="secondary", use_container_width=True, key="clear_general_chat"):
-                    st.session_state.chatbot_messages = []
-                    st.rerun()
-
-        # Display chat messages
-        if st.session_state.get('chatbot_messages', []):
-            with st.container():
-                for message in st.session_state.chatbot_messages:
-                    with st.chat_message(message["role"]):
-                        st.markdown(message["content"], unsafe_allow_html=True)
-
-        # Handle new messages from general chat (including example questions)
-        active_prompt = general_prompt if general_prompt and general_prompt.strip() else st.session_state.example_question_clicked
-        
-        if active_prompt:
-            # Check if this message was already processed
-            if 'last_general_prompt' not in st.session_state or st.session_state.last_general_prompt != active_prompt:
-                st.session_state.last_general_prompt = active_prompt
-                st.session_state.example_question_clicked = None  # Reset example question
-                
-                # Add user message to chat history
-                st.session_state.chatbot_messages.append({"role": "user", "content": active_prompt})
-                
-                # Build context from analysis if available
-                context = ""
-                if 'analysis_text' in st.session_state and st.session_state.analysis_text:
-                    context += f"\n\nPrevious Analysis:\n{st.session_state.analysis_text[:1000]}"
-                
-                # Check for dataframe data
-                if 'df' in st.session_state and st.session_state.get('df') is not None:
-                    df_context = st.session_state['df']
-                    context += f"\n\nData Context:\n"
-                    context += f"- Total Rows: {len(df_context)}\n"
-                    context += f"- Total Columns: {len(df_context.columns)}\n"
-                    context += f"- Columns: {', '.join(df_context.columns.tolist()[:15])}\n\n"
-                    
-                    # Add statistical summary for numeric columns
-                    numeric_cols = df_context.select_dtypes(include=['number']).columns[:5]
-                    if len(numeric_cols) > 0:
-                        context += "Key Numeric Statistics:\n"
-                        for col in numeric_cols:
-                            context += f"  - {col}: mean={df_context[col].mean():.2f}, median={df_context[col].median():.2f}, std={df_context[col].std():.2f}\n"
-                    
-                    # Add value counts for categorical columns
-                    categorical_cols = df_context.select_dtypes(include=['object']).columns[:3]
-                    if len(categorical_cols) > 0:
-                        context += "\nKey Categorical Distributions:\n"
-                        for col in categorical_cols:
-                            top_values = df_context[col].value_counts().head(5).to_dict()
-                            context += f"  - {col}: {top_values}\n"
-                    
-                    # Add sample rows
-                    context += f"\nSample Data (first 3 rows):\n{df_context.head(3).to_string()}"
-                
-                # Check for text/document data
-                elif extracted_text:
-                    context += f"\n\nDocument Content ({len(extracted_text)} characters):\n"
-                    # Include substantial portion of text (up to 4000 chars for better context)
-                    max_text_chars = 4000
-                    context += extracted_text[:max_text_chars]
-                    if len(extracted_text) > max_text_chars:
-                        context += "\n...[Content truncated]"
-                
-                # Create HCP-focused prompt with user profile
-                user_profile = st.session_state.get('user_profile', {})
-                knowledge = user_profile.get('knowledge_level', 'Intermediate')
-                language = user_profile.get('language', 'English')
-                hcp_role = user_profile.get('hcp_type', 'Healthcare Professional')
-                
-                full_prompt = f"""You are MedInsight, an AI assistant helping Healthcare Professionals (HCPs) analyze Real-World Evidence (RWE) data.
-
-User Profile:
-- Role: {hcp_role}
-- Knowledge Level: {knowledge}
-- Language: {language}
-
-User Question: {active_prompt}
-
-DATA AVAILABLE TO YOU:
-{context}
-
-INSTRUCTIONS:
-Answer the user's question based SPECIFICALLY on the data provided above. Use actual numbers, column names, and values from the dataset.
-- Reference specific findings from the data (e.g., "The average weight change was -11.3 kg in the Mounjaro group")
-- Cite actual statistics and distributions shown in the data
-- Focus on the treatments, outcomes, and patient characteristics present in THIS dataset
-- Tailor complexity to {knowledge} level
-- If the data doesn't contain information to answer the question, acknowledge this and suggest related insights from available data
-
-Keep your response concise (3-4 paragraphs max), clinically relevant, and evidence-based using the actual data provided.
-
-Response:"""
-                
-                # Generate AI response
-                try:
-                    with st.spinner("AI is thinking..."):
-                        response = generate_ai_response(full_prompt)
-                    
-                    # Add assistant response to chat history
-                    st.session_state.chatbot_messages.append({"role": "assistant", "content": response})
-                    
-                    # Auto-play TTS for chatbot response if enabled
-                    if st.session_state.tts_enabled:
-                        speak_text(response)
-                    
-                    # Rerun to display new messages
-                    st.rerun()
-                        
-                except Exception as e:
-                    st.error(f"Error generating response: {str(e)}")
+        render_chat_assistant(extracted_text)
         
         st.markdown("---")
         
@@ -1706,25 +2187,7 @@ Present the analysis in a clear, professional format that an HCP would find valu
                         language = user_profile.get('language', 'English')
                         hcp_role = user_profile.get('hcp_type', 'Healthcare Professional')
                         
-                        # Limit data to prevent token overflow
-                        sample_size = min(5, len(df))
-                        cols_to_show = min(10, len(df.columns))
-                        
-                        data_summary = f"""
-Dataset Overview:
-- Total Rows: {len(df)}
-- Total Columns: {len(df.columns)}
-- Column Names: {', '.join(df.columns.tolist()[:cols_to_show])}{'...' if len(df.columns) > cols_to_show else ''}
-
-Data Types (first {cols_to_show} columns):
-{df.dtypes.head(cols_to_show).to_string()}
-
-Statistical Summary (first {cols_to_show} numeric columns):
-{df.describe().iloc[:, :cols_to_show].to_string()}
-
-Sample Data (first {sample_size} rows, first {cols_to_show} columns):
-{df.head(sample_size).iloc[:, :cols_to_show].to_string()}
-"""
+                        data_summary = build_data_summary(data_key, df)
                         prompt = f"""You are analyzing this Real-World Evidence (RWE) data for a {hcp_role} with {knowledge} knowledge level.
 Language preference: {language} (adapt complexity and terminology accordingly).
 
@@ -1750,17 +2213,15 @@ Present insights in a format that supports evidence-based clinical decision-maki
 """
                     
                     try:
-                        analysis_text = generate_ai_response(prompt)
-                        st.session_state.analysis_text = analysis_text
-                        
                         # Display results with clear user-friendly structure
                         st.markdown("---")
                         st.markdown("### Your Analysis Results")
                         
                         st.info("**Understanding Your Results**: The AI has reviewed your data and broken down the findings into clear sections below. Each section focuses on a specific aspect to help you make informed decisions.")
                         
-                        # Display the analysis in a well-structured format
-                        st.markdown(analysis_text)
+                        # Stream the analysis as it is generated; the full text is returned for reuse below
+                        analysis_text = st.write_stream(stream_ai_response(prompt))
+                        st.session_state.analysis_text = analysis_text
                         
                         # Add helpful context after analysis
                         st.markdown("---")
@@ -1789,7 +2250,10 @@ Present insights in a format that supports evidence-based clinical decision-maki
                         # Store analysis in session state for visualization
                         st.session_state['analysis_done'] = True
                         st.session_state['analysis_text'] = analysis_text
+                        # Excerpt reused by every chat prompt, cut once here
+                        st.session_state['analysis_preview'] = analysis_text[:ANALYSIS_PREVIEW_CHARS]
                         st.session_state['df'] = df
+                        st.session_state['data_key'] = data_key
                         
                         # ============================================
                         # CHAT INTERFACE - AFTER ANALYSIS
@@ -1802,21 +2266,13 @@ Present insights in a format that supports evidence-based clinical decision-maki
                         st.markdown("**Quick Questions:**")
                         followup_cols = st.columns(4)
                         
-                        followup_questions = [
-                            "Explain the clinical significance",
-                            "What are the limitations?",
-                            "Compare to typical outcomes",
-                            "What should I investigate further?"
-                        ]
-                        
                         if 'followup_question_clicked' not in st.session_state:
                             st.session_state.followup_question_clicked = None
                         
                         for idx, col in enumerate(followup_cols):
                             with col:
-                                if st.button(followup_questions[idx], key=f"followup_q_{idx}", use_container_width=True):
-                                    st.session_state.followup_question_clicked = followup_questions[idx]
-                                    st.rerun()
+                                st.button(FOLLOWUP_QUESTIONS[idx], key=f"followup_q_{idx}", use_container_width=True,
+                                          on_click=set_clicked_question, args=("followup_question_clicked", FOLLOWUP_QUESTIONS[idx]))
                         
                         st.markdown("")
                         
@@ -1869,7 +2325,7 @@ Present insights in a format that supports evidence-based clinical decision-maki
                                 st.session_state.chatbot_messages.append({"role": "user", "content": active_followup})
                                 
                                 # Build context from analysis
-                                context = f"\n\nPrevious Analysis:\n{analysis_text[:1000]}"
+                                context = f"\n\nPrevious Analysis:\n{st.session_state.analysis_preview}"
                                 
                                 if df is not None:
                                     context += f"\n\nData Context: {len(df)} rows, {len(df.columns)} columns"
@@ -1888,8 +2344,6 @@ User Profile:
 - Knowledge Level: {knowledge}
 - Language: {language}
 
-User Question: {active_followup}
-
 {context}
 
 Provide a helpful, professional response tailored for this {hcp_role} with {knowledge} knowledge level. 
@@ -1899,6 +2353,8 @@ Adapt your response complexity and terminology to match their expertise. Focus o
 - Clear, actionable guidance
 - Terminology suitable for {knowledge} level
 
+User Question: {active_followup}
+
 Response:"""
                                 
                                 # Generate AI response
@@ -2023,6 +2479,8 @@ Powered by BRIDGE AI
                 st.caption("Transforms your data into interactive charts and 3D graphs. Visual representations make it easier to spot trends, compare values, and present findings to others.")
                 visualize_button = st.button("Generate Visualizations & 3D AR Graphs", use_container_width=True)
                 if visualize_button:
+                    import plotly.graph_objects as go
+                    
                     # Show AI Analysis again
                     st.markdown("### AI Analysis")
                     st.markdown(st.session_state.get('analysis_text', ''))
@@ -2050,8 +2508,9 @@ Powered by BRIDGE AI
                             """)
                         
                         # Get numeric and categorical columns
-                        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                        categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+                        basic_stats = get_basic_statistics(data_key, df)
+                        numeric_cols = basic_stats['numeric_columns']
+                        categorical_cols = basic_stats['categorical_columns']
                     
                     if len(numeric_cols) >= 2:
                         # 3D Scatter Plot (AR-ready)
@@ -2059,7 +2518,9 @@ Powered by BRIDGE AI
                         st.markdown("#### 3D Interactive Scatter Plot")
                         st.markdown("**What this shows:** A three-dimensional view of your data where each point represents a record. This helps you see clusters, outliers, and relationships between multiple variables at once. Try rotating it with your mouse!")
                         
-                        import plotly.graph_objects as go
+                        plot_df = downsample_for_plot(data_key, df)
+                        if len(plot_df) < len(df):
+                            st.caption(f"Showing a random sample of {len(plot_df):,} of {len(df):,} rows for responsiveness.")
                         
                         # Select up to 3 numeric columns for 3D plot
                         x_col = numeric_cols[0]
@@ -2069,55 +2530,9 @@ Powered by BRIDGE AI
                         # Color by categorical if available
                         color_col = categorical_cols[0] if categorical_cols else None
                         
-                        if color_col:
-                            # Create color mapping for categorical column
-                            unique_categories = df[color_col].unique()
-                            colors = ['#2196F3' if i % 2 == 0 else '#1565C0' for i in range(len(unique_categories))]
-                            color_map = {cat: colors[i] for i, cat in enumerate(unique_categories)}
-                            
-                            fig = go.Figure(data=[go.Scatter3d(
-                                x=df[x_col],
-                                y=df[y_col],
-                                z=df[z_col],
-                                mode='markers',
-                                marker=dict(
-                                    size=6,
-                                    color=[color_map[val] for val in df[color_col]],
-                                    line=dict(color='#1976D2', width=0.5)
-                                ),
-                                text=[f"{color_col}: {val}" for val in df[color_col]],
-                                hovertemplate=f'<b>%{{text}}</b><br>{x_col}: %{{x}}<br>{y_col}: %{{y}}<br>{z_col}: %{{z}}<extra></extra>'
-                            )])
-                        else:
-                            fig = go.Figure(data=[go.Scatter3d(
-                                x=df[x_col],
-                                y=df[y_col],
-                                z=df[z_col],
-                                mode='markers',
-                                marker=dict(
-                                    size=6,
-                                    color='#2196F3',
-                                    line=dict(color='#1976D2', width=0.5)
-                                ),
-                                hovertemplate=f'{x_col}: %{{x}}<br>{y_col}: %{{y}}<br>{z_col}: %{{z}}<extra></extra>'
-                            )])
+                        fig = build_scatter_3d(data_key, plot_df, x_col, y_col, z_col, color_col)
                         
-                        fig.update_layout(
-                            title=dict(
-                                text=f'3D Scatter: {x_col} vs {y_col} vs {z_col}',
-                                font=dict(color='#1565C0', size=18)
-                            ),
-                            scene=dict(
-                                xaxis=dict(title=x_col, gridcolor='#E3F2FD', backgroundcolor='#FFFFFF'),
-                                yaxis=dict(title=y_col, gridcolor='#E3F2FD', backgroundcolor='#FFFFFF'),
-                                zaxis=dict(title=z_col, gridcolor='#E3F2FD', backgroundcolor='#FFFFFF'),
-                            ),
-                            paper_bgcolor='#FFFFFF',
-                            font=dict(color='#212121'),
-                            height=600
-                        )
-                        
-                        st.plotly_chart(fig, use_container_width=True)
+                        st.plotly_chart(fig, use_container_width=True, theme=None)
                     
                     # Distribution plots
                     if numeric_cols:
@@ -2148,7 +2563,7 @@ Powered by BRIDGE AI
                                 height=400
                             )
                             
-                            st.plotly_chart(fig, use_container_width=True)
+                            st.plotly_chart(fig, use_container_width=True, theme=None)
                     
                     # Categorical distribution
                     if categorical_cols:
@@ -2157,32 +2572,7 @@ Powered by BRIDGE AI
                         st.markdown("**What this shows:** Comparison of different categories in your data. Longer bars indicate more frequent categories. This helps you see which groups are most common or rare.")
                         
                         for cat_col in categorical_cols[:3]:  # Show first 3 categorical columns
-                            value_counts = df[cat_col].value_counts().head(10)
-                            
-                            fig = go.Figure(data=[go.Bar(
-                                x=value_counts.values,
-                                y=value_counts.index,
-                                orientation='h',
-                                marker_color='#2196F3',
-                                marker_line_color='#1565C0',
-                                marker_line_width=1.5
-                            )])
-                            
-                            fig.update_layout(
-                                title=dict(
-                                    text=f'Top Values in {cat_col}',
-                                    font=dict(color='#1565C0', size=16)
-                                ),
-                                xaxis=dict(title='Count', gridcolor='#E3F2FD'),
-                                yaxis=dict(title=cat_col, gridcolor='#E3F2FD'),
-                                paper_bgcolor='#FFFFFF',
-                                plot_bgcolor='#FFFFFF',
-                                font=dict(color='#212121'),
-                                showlegend=False,
-                                height=400
-                            )
-                            
-                            st.plotly_chart(fig, use_container_width=True)
+                            st.plotly_chart(build_category_bar_chart(data_key, df, cat_col), use_container_width=True, theme=None)
                     
                     # Correlation heatmap if multiple numeric columns
                     if len(numeric_cols) > 1:
@@ -2190,7 +2580,7 @@ Powered by BRIDGE AI
                         st.markdown("#### Correlation Matrix")
                         st.markdown("**What this shows:** How variables relate to each other. Darker blue means strong positive relationship (when one goes up, the other does too). White means no relationship. Numbers range from -1 to +1, with values closer to 1 or -1 indicating stronger relationships.")
                         
-                        corr_matrix = df[numeric_cols].corr()
+                        corr_matrix = get_correlation_matrix(data_key, df)
                         
                         fig = go.Figure(data=go.Heatmap(
                             z=corr_matrix.values,
@@ -2215,7 +2605,7 @@ Powered by BRIDGE AI
                             height=600
                         )
                         
-                        st.plotly_chart(fig, use_container_width=True)
+                        st.plotly_chart(fig, use_container_width=True, theme=None)
         
         # AR Visualisation Export
         st.markdown("---")
@@ -2223,7 +2613,7 @@ Powered by BRIDGE AI
         st.markdown("*Export 3D visualisations for AR viewing*")
         
         if df is not None and not df.empty:
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+            numeric_cols = get_basic_statistics(data_key, df)['numeric_columns']
             if len(numeric_cols) >= 2:
                 if st.button("Generate AR-Ready 3D Model", type="primary"):
                     with st.spinner("Creating AR visualisation..."):
@@ -2231,50 +2621,21 @@ Powered by BRIDGE AI
                         x_col = numeric_cols[0]
                         y_col = numeric_cols[1] if len(numeric_cols) > 1 else numeric_cols[0]
                         z_col = numeric_cols[2] if len(numeric_cols) > 2 else numeric_cols[0]
+                        plot_df = downsample_for_plot(data_key, df)
+                        if len(plot_df) < len(df):
+                            st.caption(f"Showing a random sample of {len(plot_df):,} of {len(df):,} rows for responsiveness. The download includes every row.")
                         
-                        fig = go.Figure(data=[go.Scatter3d(
-                            x=df[x_col],
-                            y=df[y_col],
-                            z=df[z_col],
-                            mode='markers',
-                            marker=dict(
-                                size=8,
-                                color=df[z_col] if z_col in df.columns else '#2196F3',
-                                colorscale=[[0, '#E3F2FD'], [0.5, '#1976D2'], [1, '#1565C0']],
-                                line=dict(color='#1976D2', width=1),
-                                showscale=True
-                            ),
-                            hovertemplate=f'{x_col}: %{{x}}<br>{y_col}: %{{y}}<br>{z_col}: %{{z}}<extra></extra>'
-                        )])
+                        fig = build_ar_figure(data_key, plot_df, x_col, y_col, z_col, len(plot_df))
                         
-                        fig.update_layout(
-                            title=dict(
-                                text=f'AR-Ready 3D Visualisation',
-                                font=dict(color='#1565C0', size=20)
-                            ),
-                            scene=dict(
-                                xaxis=dict(title=x_col, backgroundcolor='#FFFFFF', gridcolor='#E3F2FD'),
-                                yaxis=dict(title=y_col, backgroundcolor='#FFFFFF', gridcolor='#E3F2FD'),
-                                zaxis=dict(title=z_col, backgroundcolor='#FFFFFF', gridcolor='#E3F2FD'),
-                                camera=dict(
-                                    eye=dict(x=1.5, y=1.5, z=1.5)
-                                )
-                            ),
-                            paper_bgcolor='#FFFFFF',
-                            font=dict(color='#212121'),
-                            height=700
-                        )
+                        st.plotly_chart(fig, use_container_width=True, theme=None)
                         
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Export HTML for AR
-                        html_buffer = BytesIO()
-                        fig.write_html(html_buffer)
-                        html_buffer.seek(0)
+                        # Export HTML for AR from the full dataset (rendered straight to bytes, no intermediate buffer)
+                        export_fig = fig if len(plot_df) == len(df) else build_ar_figure(data_key, df, x_col, y_col, z_col, len(df))
+                        html_bytes = export_fig.to_html().encode('utf-8')
                         
                         st.download_button(
                             label="Download AR Visualisation (HTML)",
-                            data=html_buffer,
+                            data=html_bytes,
                             file_name="ar_visualization.html",
                             mime="text/html",
                             help="Open this file on your phone/tablet with AR capabilities"
@@ -2292,7 +2653,7 @@ Powered by BRIDGE AI
         
         if df is not None and not df.empty:
             with col1:
-                csv = df.to_csv(index=False).encode('utf-8')
+                csv = export_csv_bytes(data_key, df)
                 st.download_button(
                     label="Download Data (CSV)",
                     data=csv,
@@ -2302,8 +2663,9 @@ Powered by BRIDGE AI
             
             with col2:
                 # Basic statistics
-                if len(df.select_dtypes(include=['number']).columns) > 0:
-                    stats = df.describe().to_csv().encode('utf-8')
+                basic_stats = get_basic_statistics(data_key, df)
+                if basic_stats['numeric_columns']:
+                    stats = export_csv_bytes(f"{data_key}:describe", basic_stats['describe'], index=True)
                     st.download_button(
                         label="Download Statistics",
                         data=stats,
@@ -2327,8 +2689,10 @@ AI Analysis:
 
 Chat History:
 """
-                for msg in st.session_state.get('chat_history', []):
-                    report += f"\n{msg['role'].upper()}: {msg['content']}"
+                report += "".join(
+                    f"\n{msg['role'].upper()}: {msg['content']}"
+                    for msg in st.session_state.get('chatbot_messages', [])
+                )
                 
                 st.download_button(
                     label="Download Full Report",
@@ -2343,33 +2707,7 @@ Chat History:
 
 else:
     # Instructions when no input provided
-    st.markdown("### How to use:")
-    st.markdown("""
-    1. **Choose** between uploading a file or entering text directly
-    2. **Upload** your file (Excel, CSV, PowerPoint, Text, JSON) OR **paste** text in the text box
-    3. **Review** the data preview and details
-    4. **Click** "Ask AI to Analyze" to get AI-powered insights
-    5. **Ask questions** using the AI chatbot
-    6. **Generate visualizations** including 3D AR graphs
-    7. **Download** your results as needed
-    """)
-    
-    st.markdown("### Supported formats:")
-    st.markdown("""
-    - **Data Files**: Excel (.xlsx, .xls), CSV
-    - **PowerPoint**: .pptx (extracts tables and text)
-    - **Text**: .txt, .md files
-    - **JSON**: Structured data files
-    - **Direct Text Input**: Paste any text for AI analysis
-    """)
-    
-    st.markdown("### What you'll get:")
-    st.markdown("""
-    - **Quick overview** of your data or content structure
-    - **AI-powered insights** about patterns and trends
-    - **Key statistics** for numeric columns
-    - **Clinical recommendations** for further analysis
-    """)
+    st.markdown(INSTRUCTIONS_MD)
 
 # Footer
 st.markdown("---")
@@ -2390,8 +2728,8 @@ with st.sidebar:
         st.markdown('<a href="#ai-analysis"></a>', unsafe_allow_html=True)
     
     st.markdown("---")
-    st.markdown("### Tips")
     st.markdown("""
+    ### Tips
     **Getting Started:**
     1. Use the chat above to ask questions
     2. Upload your data for analysis